@@ -0,0 +1,61 @@
+use aho_corasick::{AhoCorasick, AhoCorasickBuilder, MatchKind};
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+
+fn is_word(c: char) -> bool {
+    c.is_alphanumeric() || c == '_'
+}
+
+/// Leftmost-longest Aho-Corasick scanner over the shorthand vocabulary.
+///
+/// Built once per process from the (keys, vals) arrays; replace_and_count
+/// does one DFA sweep per note with no Python dispatch per match.
+#[pyclass]
+struct Scanner {
+    ac: AhoCorasick,
+    vals: Vec<String>,
+}
+
+#[pymethods]
+impl Scanner {
+    #[new]
+    fn new(keys: Vec<String>, vals: Vec<String>) -> PyResult<Self> {
+        let ac = AhoCorasickBuilder::new()
+            .match_kind(MatchKind::LeftmostLongest)
+            .ascii_case_insensitive(true)
+            .build(&keys)
+            .map_err(|e| PyValueError::new_err(e.to_string()))?;
+        Ok(Scanner { ac, vals })
+    }
+
+    /// Replace every word-bounded vocabulary hit in `text`.
+    ///
+    /// Returns the new string and the pattern ids that were replaced, in
+    /// match order, so the caller can batch-update its Counter.
+    fn replace_and_count(&self, text: &str) -> (String, Vec<usize>) {
+        let mut out = String::with_capacity(text.len());
+        let mut ids = Vec::new();
+        let mut last = 0usize;
+        for m in self.ac.find_iter(text) {
+            // emulate the regex \b anchors around each key
+            if text[..m.start()].chars().next_back().map_or(false, is_word) {
+                continue;
+            }
+            if text[m.end()..].chars().next().map_or(false, is_word) {
+                continue;
+            }
+            out.push_str(&text[last..m.start()]);
+            out.push_str(&self.vals[m.pattern().as_usize()]);
+            ids.push(m.pattern().as_usize());
+            last = m.end();
+        }
+        out.push_str(&text[last..]);
+        (out, ids)
+    }
+}
+
+#[pymodule]
+fn _cleaner_ext(m: &Bound<'_, PyModule>) -> PyResult<()> {
+    m.add_class::<Scanner>()?;
+    Ok(())
+}
@@ -1,12 +1,26 @@
-from flask import Flask, render_template, request, send_file, redirect, url_for, session
+from flask import Flask, render_template, request, send_file, redirect, url_for, session, jsonify
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # ✅ Fix for Tkinter runtime error
-import matplotlib.pyplot as plt
-import tempfile, os
+import tempfile, os, secrets, threading
+import cachetools
 from datetime import datetime
-from fpdf import FPDF
-from cleanser import load_replacements, clean_notes
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from cleanser import load_replacements, clean_chunk
+from pdf_report import write_pdf_report
+
+# Optional PyArrow fast path for CSV ingest (multithreaded SIMD reader) and
+# Parquet/Feather output. Opt in with MTC_FAST_IO=1.
+FAST_IO = os.environ.get('MTC_FAST_IO') == '1'
+
+# Charts render client-side (Chart.js) by default; set MTC_CHART_PNG=1 to
+# also rasterise the old matplotlib PNG (matplotlib is only imported then,
+# keeping ~50 MB of backend RSS out of the default deploy).
+WANT_PNG = os.environ.get('MTC_CHART_PNG') == '1'
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # Required for Flask session
@@ -14,24 +28,87 @@ app.secret_key = 'your_secret_key'  # Required for Flask session
 # Load your shorthand dictionary
 replacements, pattern = load_replacements('fully_expanded_dataset.csv')
 
+# Results live server-side keyed by a short job id; only the id goes into
+# the signed session cookie, keeping it a few bytes instead of the whole
+# counter dict.
+JOBS = cachetools.TTLCache(maxsize=256, ttl=3600)
+# cachetools caches are not thread-safe and TTL eviction can run on any
+# access, so reads and writes from the worker pool and request threads
+# all go through this lock.
+JOBS_LOCK = threading.Lock()
+
+# In-process worker pool for upload processing: the request handler only
+# saves the file and enqueues a job, so Flask workers free up immediately.
+# (A Redis-backed queue would allow retries across processes, but this
+# deploy has no broker; the pool keeps the same poll-for-result flow.)
+WORKERS = ThreadPoolExecutor(max_workers=2)
+
 # ------------------- Reading Functions -------------------
 
-def read_csv_with_fallback(uploaded_file):
+CHUNK_SIZE = 10000
+
+def read_csv_chunks(uploaded_file):
+    if FAST_IO and pa is not None:
+        arrow_yielded = False
+        try:
+            uploaded_file.seek(0)
+            with pa_csv.open_csv(uploaded_file) as reader:
+                # Non-UTF-8 input comes back as binary columns; let the
+                # pandas ISO-8859-1 fallback below handle those files.
+                if not any(pa.types.is_binary(f.type) for f in reader.schema):
+                    for batch in reader:
+                        arrow_yielded = True
+                        yield batch.to_pandas()
+                    return
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            if arrow_yielded:
+                raise  # bad block mid-file; restarting would duplicate rows
+            # odd CSVs fall through to the pandas readers
+    yielded = False
     try:
         uploaded_file.seek(0)
-        return pd.read_csv(uploaded_file)
+        for chunk in pd.read_csv(uploaded_file, chunksize=CHUNK_SIZE):
+            yielded = True
+            yield chunk
     except UnicodeDecodeError:
+        if yielded:
+            raise  # bad bytes mid-file; restarting would duplicate rows
         uploaded_file.seek(0)
-        return pd.read_csv(uploaded_file, encoding='ISO-8859-1')
+        yield from pd.read_csv(uploaded_file, chunksize=CHUNK_SIZE, encoding='ISO-8859-1')
 
-def read_txt_with_fallback(uploaded_file):
+def read_xlsx_chunks(uploaded_file):
+    from openpyxl import load_workbook
+    uploaded_file.seek(0)
+    wb = load_workbook(uploaded_file, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        # next() raising StopIteration inside a generator becomes a
+        # RuntimeError (PEP 479); report an empty sheet like any other
+        # file without the expected column instead.
+        header_row = next(rows, None)
+        if header_row is None:
+            raise ValueError("No 'Clinical Notes' column found.")
+        header = [str(h) for h in header_row]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= CHUNK_SIZE:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        wb.close()
+
+def read_txt_chunks(uploaded_file):
     try:
         uploaded_file.seek(0)
         lines = uploaded_file.read().decode('utf-8').splitlines()
     except UnicodeDecodeError:
         uploaded_file.seek(0)
         lines = uploaded_file.read().decode('ISO-8859-1').splitlines()
-    return pd.DataFrame({'Clinical Notes': lines})
+    for i in range(0, len(lines), CHUNK_SIZE):
+        yield pd.DataFrame({'Clinical Notes': lines[i:i + CHUNK_SIZE]})
 
 # ------------------- Save Functions -------------------
 
@@ -43,7 +120,19 @@ def save_log(counter):
     log_file.close()
     return log_file.name
 
+def build_chart_data(counter):
+    items = sorted(counter.items(), key=lambda x: x[1], reverse=True)
+    return {
+        'labels': [k for k, _ in items],
+        'values': [v for _, v in items],
+    }
+
 def save_chart(counter):
+    # PNG mode only (MTC_CHART_PNG=1); the default path ships the counts
+    # as JSON and lets Chart.js draw them in the browser.
+    import matplotlib
+    matplotlib.use('Agg')  # ✅ Fix for Tkinter runtime error
+    import matplotlib.pyplot as plt
     items = sorted(counter.items(), key=lambda x: x[1], reverse=True)
     keys, values = zip(*items)
     chart_path = os.path.join('static', 'replacement_chart.png')
@@ -61,31 +150,98 @@ def save_chart(counter):
 def save_output(df, filetype):
     if filetype == 'txt':
         tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.txt', mode='w', encoding='utf-8')
-        df['Cleaned Notes'].to_csv(tmp.name, index=False, header=False)
+        df['Cleaned Notes'].to_csv(tmp.name, index=False, header=False, chunksize=CHUNK_SIZE)
     elif filetype == 'excel':
         tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-        df.to_excel(tmp.name, index=False)
+        # constant_memory streams rows to disk instead of holding the whole
+        # workbook in memory
+        with pd.ExcelWriter(
+            tmp.name, engine='xlsxwriter',
+            engine_kwargs={'options': {'constant_memory': True}},
+        ) as writer:
+            df.to_excel(writer, index=False)
+    elif filetype == 'parquet':
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.parquet')
+        df.to_parquet(tmp.name, engine='pyarrow', compression='zstd')
+    elif filetype == 'feather':
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.feather')
+        df.to_feather(tmp.name)
     elif filetype == 'pdf':
         tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.add_page()
-        pdf.set_font("Arial", size=11)
-        pdf.cell(200, 10, txt="Clinical Notes Cleaning Report", ln=True, align='C')
-        pdf.ln(10)
-        for _, row in df.iterrows():
-            pdf.multi_cell(0, 8, f"Original: {row['Original Notes']}", align='L')
-            pdf.multi_cell(0, 8, f"Cleaned: {row['Cleaned Notes']}", align='L')
-            pdf.ln(5)
-        pdf.output(tmp.name)
+        write_pdf_report(
+            tmp.name,
+            df['Original Notes'].to_numpy(),
+            df['Cleaned Notes'].to_numpy(),
+        )
     else:
         tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
-        df.to_csv(tmp.name, index=False)
+        df.to_csv(tmp.name, index=False, chunksize=CHUNK_SIZE)
     tmp.close()
     return tmp.name
 
 # ------------------- Main Routes -------------------
 
+def process_upload(upload_path, ext, filetype):
+    # Runs on a background worker thread; everything it needs comes from
+    # the saved upload file, not the request.
+    counter = Counter()
+    output_path = None
+    cleaned_chunks = []
+    with open(upload_path, 'rb') as upload:
+        if ext == 'csv':
+            chunks = read_csv_chunks(upload)
+        elif ext == 'xlsx':
+            chunks = read_xlsx_chunks(upload)
+        else:
+            chunks = read_txt_chunks(upload)
+
+        # Clean chunk by chunk so memory stays bounded for large uploads.
+        # CSV output is appended incrementally; other formats still need
+        # the full frame for save_output.
+        for chunk in chunks:
+            if 'Clinical Notes' not in chunk.columns:
+                raise ValueError("No 'Clinical Notes' column found.")
+            clean_chunk(chunk, replacements, pattern, counter)
+            if filetype == 'csv':
+                if output_path is None:
+                    tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
+                    tmp.close()
+                    output_path = tmp.name
+                    chunk.to_csv(output_path, mode='w', header=True, index=False)
+                else:
+                    chunk.to_csv(output_path, mode='a', header=False, index=False)
+            else:
+                cleaned_chunks.append(chunk)
+
+    if filetype != 'csv':
+        df_cleaned = pd.concat(cleaned_chunks, ignore_index=True)
+        output_path = save_output(df_cleaned, filetype)
+    log_path = save_log(counter)
+    chart_path = save_chart(counter) if (WANT_PNG and counter) else None
+
+    return {
+        'status': 'done',
+        'output_file': output_path,
+        'log_file': log_path,
+        'chart_url': chart_path,
+        'chart_data': build_chart_data(counter),
+        'counter': dict(counter),
+        'filetype': filetype,
+    }
+
+def _run_job(job_id, upload_path, ext, filetype):
+    try:
+        outcome = process_upload(upload_path, ext, filetype)
+    except Exception as e:
+        outcome = {'status': 'error', 'error': str(e)}
+    finally:
+        try:
+            os.unlink(upload_path)
+        except OSError:
+            pass
+    with JOBS_LOCK:
+        JOBS[job_id] = outcome
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
@@ -96,59 +252,58 @@ def index():
             return render_template('index.html', error="Please select a file to upload.", year=datetime.now().year)
 
         ext = uploaded.filename.split('.')[-1].lower()
-        try:
-            if ext == 'csv':
-                df = read_csv_with_fallback(uploaded)
-            elif ext == 'xlsx':
-                uploaded.seek(0)
-                df = pd.read_excel(uploaded)
-            elif ext == 'txt':
-                df = read_txt_with_fallback(uploaded)
-            else:
-                return render_template('index.html', error="Unsupported file type.", year=datetime.now().year)
-
-            if 'Clinical Notes' not in df.columns:
-                return render_template('index.html', error="No 'Clinical Notes' column found.", year=datetime.now().year)
+        if ext not in ('csv', 'xlsx', 'txt'):
+            return render_template('index.html', error="Unsupported file type.", year=datetime.now().year)
 
-            # Clean
-            df_cleaned, counter = clean_notes(df, replacements, pattern)
+        # Save the upload to disk and hand the heavy work to a background
+        # thread so this request returns immediately; /result polls
+        # /progress until the job finishes.
+        upload_tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.' + ext)
+        uploaded.save(upload_tmp)
+        upload_tmp.close()
 
-            # Save files
-            output_path = save_output(df_cleaned, filetype)
-            log_path = save_log(counter)
-            chart_path = save_chart(counter)
+        job_id = secrets.token_urlsafe(16)
+        with JOBS_LOCK:
+            JOBS[job_id] = {'status': 'processing'}
+        session['job_id'] = job_id
+        WORKERS.submit(_run_job, job_id, upload_tmp.name, ext, filetype)
 
-            # Store in session
-            session['output_file'] = output_path
-            session['log_file'] = log_path
-            session['chart_url'] = chart_path
-            session['counter'] = dict(counter)
-            session['filetype'] = filetype
-
-            return redirect(url_for('result'))
-
-        except Exception as e:
-            return render_template('index.html', error=f"Failed to process file: {e}", year=datetime.now().year)
+        return redirect(url_for('result'))
 
     return render_template('index.html', year=datetime.now().year)
 
+@app.route('/progress/<job_id>')
+def progress(job_id):
+    with JOBS_LOCK:
+        job = JOBS.get(job_id)
+    return jsonify({'status': job.get('status', 'done') if job else 'unknown'})
+
 @app.route('/result')
 def result():
+    with JOBS_LOCK:
+        job = JOBS.get(session.get('job_id'))
+    if job is None:
+        return redirect(url_for('index'))  # expired or unknown job
+    if job.get('status') == 'processing':
+        return render_template('result.html', processing=True, job_id=session['job_id'])
+    if job.get('status') == 'error':
+        return render_template('index.html', error=f"Failed to process file: {job['error']}", year=datetime.now().year)
     return render_template(
         'result.html',
         download_url=url_for(
             'download_file',
-            filename=os.path.basename(session.get('output_file', '')),
-            filetype=session.get('filetype', 'csv')
+            filename=os.path.basename(job['output_file']),
+            filetype=job['filetype']
         ),
         log_url=url_for(
             'download_file',
-            filename=os.path.basename(session.get('log_file', '')),
+            filename=os.path.basename(job['log_file']),
             filetype='log'
         ),
-        chart_url='/' + session.get('chart_url', ''),
-        counter=session.get('counter', {}),
-        filetype=session.get('filetype', 'csv'),
+        chart_url='/' + job['chart_url'] if job.get('chart_url') else None,
+        chart_data=job.get('chart_data'),
+        counter=job.get('counter', {}),
+        filetype=job['filetype'],
         replacements=replacements
     )
 
@@ -160,6 +315,8 @@ def download_file(filename):
         'excel': 'cleaned_data.xlsx',
         'txt': 'cleaned_data.txt',
         'pdf': 'cleaned_data.pdf',
+        'parquet': 'cleaned_data.parquet',
+        'feather': 'cleaned_data.feather',
         'log': 'replacement_log.csv'
     }
     download_name = ext_map.get(filetype, filename)
@@ -1,32 +1,21 @@
 import pandas as pd
 import os
-import re
 from collections import Counter
-from fpdf import FPDF
+from cleanser import load_replacements, apply_regex
+from pdf_report import write_pdf_report
 
-# === Load replacement dictionary ===
-replacement_df = pd.read_csv('fully_expanded_dataset.csv').dropna()
-replacements = {
-    row['shorthand'].strip().lower(): row['full_form'].strip().lower()
-    for _, row in replacement_df.iterrows()
-}
-
-# Compile regex pattern for efficient replacements
-replacement_pattern = re.compile(
-    r'\b(' + '|'.join(re.escape(k) for k in replacements.keys()) + r')\b'
-)
+# === Load replacement dictionary (shared cached load from cleanser) ===
+replacements, replacement_pattern = load_replacements('fully_expanded_dataset.csv')
 
 def bulk_replace(text, counter):
-    def replace_match(match):
-        word = match.group(0).lower()
-        counter[word] += 1
-        return replacements[word]
-    return replacement_pattern.sub(replace_match, str(text).lower())
+    # One findall pass feeds the Counter in bulk, keeping the sub
+    # callback side-effect free.
+    lowered = str(text).lower()
+    counter.update(replacement_pattern.findall(lowered))
+    return replacement_pattern.sub(lambda m: replacements[m.group(0)], lowered)
 
-def apply_regex(text):
-    text = re.sub(r'[^\w\s,\/]', '', text)  # Remove unwanted symbols
-    text = re.sub(r'\s+', ' ', text).strip()  # Normalize whitespace
-    return text
+# apply_regex comes from cleanser, where its two patterns are compiled once
+# at module scope.
 
 def load_input_file(filepath):
     ext = os.path.splitext(filepath)[1].lower()
@@ -71,7 +60,6 @@ for filename in os.listdir(input_folder):
 
     print(f"\n🔄 Processing: {filename}")
     replacement_counts = Counter()
-    all_cleaned_chunks = []
 
     try:
         df = load_input_file(input_path)
@@ -88,9 +76,10 @@ for filename in os.listdir(input_folder):
         lambda text: apply_regex(bulk_replace(text, replacement_counts))
     )
 
-    columns_to_save = ['Original Notes', 'Cleaned Notes']
-    df[columns_to_save].to_csv(output_csv_path, index=False)
-    all_cleaned_chunks.append(df[columns_to_save].copy())
+    # One view of the cleaned columns feeds every output sink directly;
+    # no chunk list / pd.concat copy of the whole frame in between.
+    cleaned_df = df[['Original Notes', 'Cleaned Notes']]
+    cleaned_df.to_csv(output_csv_path, index=False)
 
     # === Save Log File ===
     with open(log_path, 'w', encoding='utf-8') as log_file:
@@ -102,38 +91,26 @@ for filename in os.listdir(input_folder):
     print(f"📝 Log saved: {log_path}")
 
     # === Export to TXT, Excel, PDF ===
-    full_cleaned_df = pd.concat(all_cleaned_chunks, ignore_index=True)
 
     # Save TXT
     txt_output_path = os.path.join(output_folder, output_base + '.txt')
     with open(txt_output_path, 'w', encoding='utf-8') as txt_file:
-        txt_file.write(full_cleaned_df.to_string(index=False))
+        txt_file.write(cleaned_df.to_string(index=False))
     print(f"📄 TXT file saved: {txt_output_path}")
 
     # Save Excel
     excel_output_path = os.path.join(output_folder, output_base + '.xlsx')
-    full_cleaned_df.to_excel(excel_output_path, index=False)
+    cleaned_df.to_excel(excel_output_path, index=False)
     print(f"📘 Excel file saved: {excel_output_path}")
 
-    # Save PDF
+    # Save PDF (streamed page by page via reportlab)
     pdf_output_path = os.path.join(output_folder, output_base + '.pdf')
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", size=11)
-
-    pdf.cell(200, 10, txt="Clinical Notes Cleaning Report", ln=True, align='C')
-    pdf.ln(10)
-
-    for i, row in full_cleaned_df.iterrows():
-        pdf.multi_cell(0, 8, f"Original: {row['Original Notes']}", align='L')
-        pdf.multi_cell(0, 8, f"Cleaned: {row['Cleaned Notes']}", align='L')
-        pdf.ln(5)
-        if i % 100 == 0 and i != 0:
-            pdf.add_page()
-
     try:
-        pdf.output(pdf_output_path)
+        write_pdf_report(
+            pdf_output_path,
+            cleaned_df['Original Notes'].to_numpy(),
+            cleaned_df['Cleaned Notes'].to_numpy(),
+        )
         print(f"📕 PDF file saved: {pdf_output_path}")
     except Exception as e:
         print(f"❌ Failed to save PDF: {e}")
@@ -1,8 +1,66 @@
+import functools
+import os
+import pickle
+
+import numpy as np
 import pandas as pd
 import re
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
-def load_replacements(rep_file='fully_expanded_dataset.csv'):
+# Optional compiled scanner (pip install ./_cleaner_ext, needs a Rust
+# toolchain): leftmost-longest Aho-Corasick replace-and-count in one call,
+# no Python dispatch per match.
+try:
+    import _cleaner_ext
+except ImportError:
+    _cleaner_ext = None
+
+# Optional C-extension scanner: one linear pass over the text instead of
+# regex alternation over every shorthand key.
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Optional Hyperscan backend: compiles the whole shorthand vocabulary into a
+# single DFA, so scan time stays O(len(text)) no matter how large the
+# dictionary grows. Not pinned in requirements.txt because wheels are
+# platform-specific; the automaton/regex paths below cover its absence.
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+_automaton = None
+_ext_scanner = None
+_keys = None
+_vals = None
+_key2id = None
+_pattern = None
+_hs_db = None
+_hs_vals = None
+_single_tokens = None
+_multi_tokens = None
+_multi_pattern = None
+_word_char = re.compile(r'\w').match
+
+# Bump whenever the compiled pattern changes shape, so stale .pkl caches
+# from older code are discarded.
+_CACHE_VERSION = 2
+
+def _load_compiled(rep_file):
+    # Parsing the CSV and compiling the alternation regex are both O(N-keys);
+    # cache the result next to the CSV so later processes skip both steps.
+    pkl_file = os.path.splitext(rep_file)[0] + '.pkl'
+    csv_mtime = os.path.getmtime(rep_file)
+    try:
+        with open(pkl_file, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('mtime') == csv_mtime and cached.get('version') == _CACHE_VERSION:
+            return cached['replacements'], cached['pattern']
+    except (OSError, pickle.PickleError, EOFError, AttributeError, KeyError):
+        pass
     rep_df = pd.read_csv(rep_file).dropna()
     rep_df.columns = [col.strip().lower() for col in rep_df.columns]
     replacements = {
@@ -10,26 +68,346 @@ def load_replacements(rep_file='fully_expanded_dataset.csv'):
         for _, row in rep_df.iterrows()
     }
     pattern = re.compile(
-        r'\b(' + '|'.join(re.escape(k) for k in replacements.keys()) + r')\b'
+        r'\b(' + '|'.join(re.escape(k) for k in replacements.keys()) + r')\b',
+        re.IGNORECASE,
     )
+    try:
+        with open(pkl_file, 'wb') as f:
+            pickle.dump(
+                {'version': _CACHE_VERSION, 'mtime': csv_mtime,
+                 'replacements': replacements, 'pattern': pattern},
+                f,
+            )
+    except OSError:
+        pass  # read-only deploys still work, just without the cache
+    return replacements, pattern
+
+@functools.lru_cache(maxsize=1)
+def load_replacements(rep_file='fully_expanded_dataset.csv'):
+    global _automaton, _ext_scanner, _keys, _vals, _key2id, _pattern
+    global _single_tokens, _multi_tokens, _multi_pattern
+    replacements, pattern = _load_compiled(rep_file)
+    _pattern = pattern
+    # Structure-of-arrays view of the vocabulary: every scan backend records
+    # int pattern ids during the pass and the Counter is filled in one
+    # update afterwards, instead of two dict lookups per match.
+    _keys = list(replacements.keys())
+    _vals = [replacements[k] for k in _keys]
+    _key2id = {k: i for i, k in enumerate(_keys)}
+    if _cleaner_ext is not None:
+        _ext_scanner = _cleaner_ext.Scanner(_keys, _vals)
+    # Most shorthand keys are single whitespace-delimited tokens, so the
+    # pure-Python fallback can replace them with one dict lookup per token
+    # and keep a much smaller regex for the multi-word keys only.
+    _single_tokens = {k: v for k, v in replacements.items() if ' ' not in k}
+    _multi_tokens = {k: v for k, v in replacements.items() if ' ' in k}
+    if _multi_tokens:
+        _multi_pattern = re.compile(
+            r'\b(' + '|'.join(re.escape(k) for k in _multi_tokens.keys()) + r')\b',
+            re.IGNORECASE,
+        )
+    else:
+        _multi_pattern = None
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for idx, short in enumerate(_keys):
+            automaton.add_word(short, idx)
+        automaton.make_automaton()
+        _automaton = automaton
+    if hyperscan is not None:
+        global _hs_db, _hs_vals
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[rb'\b' + re.escape(k).encode('utf-8') + rb'\b' for k in _keys],
+            ids=list(range(len(_keys))),
+            flags=[hyperscan.HS_FLAG_SOM_LEFTMOST | hyperscan.HS_FLAG_CASELESS] * len(_keys),
+        )
+        _hs_db = db
+        _hs_vals = [v.encode('utf-8') for v in _vals]
     return replacements, pattern
 
+# Compiled once at module scope so apply_regex skips the re-cache lookup
+# on every row.
+_SYM = re.compile(r'[^\w\s,\/]')
+_WS = re.compile(r'\s+')
+
 def apply_regex(text):
-    text = re.sub(r'[^\w\s,\/]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return _WS.sub(' ', _SYM.sub('', text)).strip()
 
-def bulk_replace(text, replacements, pattern, counter):
-    def replace_match(match):
+def _replace_ac(text, counter, lowered=None):
+    # The automaton is case-sensitive, so scan a lowered copy for positions
+    # but splice from the original text, keeping the casing of everything
+    # that is not replaced. Only hits on word boundaries count (the \b
+    # behaviour of the regex fallback). Callers that batch-lowered the whole
+    # column (np.strings.lower in clean_chunk) pass the copy in.
+    if lowered is None:
+        lowered = text.lower()
+    if len(lowered) != len(text):
+        # Lowercasing is not length-preserving for every character
+        # ('İ' becomes 'i̇'), so the automaton's offsets would splice the
+        # wrong spans of the original; take the regex path for such rows.
+        counter.update(map(str.lower, _pattern.findall(text)))
+        return _pattern.sub(lambda m: _vals[_key2id[m.group(0).lower()]], text)
+    matches = []
+    for end, idx in _automaton.iter(lowered):
+        start = end - len(_keys[idx]) + 1
+        if start > 0 and _word_char(lowered[start - 1]):
+            continue
+        if end + 1 < len(lowered) and _word_char(lowered[end + 1]):
+            continue
+        matches.append((start, end, idx))
+    if not matches:
+        return text
+    matches.sort(key=lambda m: (m[0], -m[1]))
+    parts = []
+    ids = []
+    last = 0
+    for start, end, idx in matches:
+        if start < last:
+            continue  # overlapped by an earlier (longer) match
+        parts.append(text[last:start])
+        parts.append(_vals[idx])
+        ids.append(idx)
+        last = end + 1
+    parts.append(text[last:])
+    counter.update(_keys[i] for i in ids)
+    return ''.join(parts)
+
+def bulk_replace_hs(text, counter):
+    # Hyperscan reports (start, end) byte offsets for every vocabulary hit in
+    # one streaming sweep (caseless, so no lowered copy is needed); sort
+    # them, keep the leftmost-longest survivors and splice the replacements
+    # into a bytearray.
+    data = text.encode('utf-8')
+    hits = []
+    def on_match(match_id, start, end, flags, context):
+        hits.append((start, end, match_id))
+    _hs_db.scan(data, match_event_handler=on_match)
+    if not hits:
+        return text
+    hits.sort(key=lambda h: (h[0], -h[1]))
+    buf = bytearray()
+    ids = []
+    last = 0
+    for start, end, match_id in hits:
+        if start < last:
+            continue  # overlapped by an earlier (longer) match
+        buf += data[last:start]
+        buf += _hs_vals[match_id]
+        ids.append(match_id)
+        last = end
+    buf += data[last:]
+    counter.update(_keys[i] for i in ids)
+    return buf.decode('utf-8')
+
+_token_edge = re.compile(r'^(\W*)(.*?)(\W*)$', re.DOTALL)
+_nonword = re.compile(r'\W').search
+
+def _replace_tokens(text, counter):
+    # Multi-word keys first (the Aho-Corasick/Hyperscan paths also prefer
+    # the longer phrase), then one dict lookup per whitespace token for the
+    # single-token majority -- no large alternation regex involved. Only
+    # the segments between multi-word matches get the token pass, so a
+    # substituted full form is never rescanned.
+    if _multi_pattern is None:
+        return _replace_single_tokens(text, counter)
+    parts = []
+    last = 0
+    for match in _multi_pattern.finditer(text):
         word = match.group(0).lower()
         counter[word] += 1
-        return replacements[word]
-    return pattern.sub(replace_match, str(text).lower())
+        parts.append(_replace_single_tokens(text[last:match.start()], counter))
+        parts.append(_multi_tokens[word])
+        last = match.end()
+    parts.append(_replace_single_tokens(text[last:], counter))
+    return ' '.join(p for p in parts if p)
 
-def clean_notes(df, replacements, pattern):
+def _replace_single_tokens(text, counter):
+    out = []
+    hits = []
+    for token in text.split():
+        lowered = token.lower()
+        full = _single_tokens.get(lowered)
+        if full is None and not token.isalnum():
+            # "bp," style tokens: strip edge punctuation, keep it around
+            # the replacement
+            prefix, core, suffix = _token_edge.match(lowered).groups()
+            full = _single_tokens.get(core)
+            if full is not None:
+                token = token[:len(prefix)] + full + token[len(token) - len(suffix):]
+                hits.append(core)
+                out.append(token)
+                continue
+            if _nonword(core):
+                # keys joined by internal punctuation ("bp/hr", "high-bp")
+                # need real \b matching; defer these rare tokens to the
+                # compiled pattern so this path agrees with the other
+                # backends
+                found = _pattern.findall(token)
+                if found:
+                    hits.extend(map(str.lower, found))
+                    out.append(_pattern.sub(
+                        lambda m: _vals[_key2id[m.group(0).lower()]], token
+                    ))
+                    continue
+        if full is None:
+            out.append(token)
+        else:
+            out.append(full)
+            hits.append(lowered)
+    counter.update(hits)
+    return ' '.join(out)
+
+# Templated notes repeat heavily across clinical corpora, so memoize the
+# scan per unique input. Module level, so the cache persists across uploads
+# in a long-lived Flask worker.
+@functools.lru_cache(maxsize=100_000)
+def _replace_pure(text):
+    # Side-effect-free scan: returns the replaced text plus the matched
+    # keys, which the caller folds into its own Counter.
+    local = Counter()
+    if _ext_scanner is not None:
+        replaced, ids = _ext_scanner.replace_and_count(text)
+        return replaced, tuple(_keys[i] for i in ids)
+    if _hs_db is not None:
+        replaced = bulk_replace_hs(text, local)
+    elif _automaton is not None:
+        replaced = _replace_ac(text, local)
+    elif _single_tokens is not None:
+        replaced = _replace_tokens(text, local)
+    else:
+        # findall collects every hit in one C-level sweep for a single
+        # bulk Counter update, so the sub callback stays side-effect
+        # free. The pattern is case-insensitive, hence the lower().
+        local.update(map(str.lower, _pattern.findall(text)))
+        replaced = _pattern.sub(
+            lambda m: _vals[_key2id[m.group(0).lower()]], text
+        )
+    return replaced, tuple(local.elements())
+
+def _replace_text(text, replacements, pattern, counter):
+    replaced, matches = _replace_pure(text)
+    counter.update(matches)
+    return replaced
+
+def bulk_replace(text, replacements, pattern, counter):
+    return _replace_text(str(text), replacements, pattern, counter)
+
+# Rows are independent, so the scan parallelises cleanly across cores.
+# Small frames stay serial: fork/dispatch overhead beats the win below this.
+_PARALLEL_MIN_ROWS = 2000
+
+_executor = None
+_worker_replacements = None
+_worker_pattern = None
+
+def _init_worker(rep_file):
+    global _worker_replacements, _worker_pattern
+    _worker_replacements, _worker_pattern = load_replacements(rep_file)
+
+def _clean_slice(texts):
     counter = Counter()
-    df['Original Notes'] = df['Clinical Notes'].astype(str)
-    df['Cleaned Notes'] = df['Original Notes'].apply(
-        lambda text: apply_regex(bulk_replace(text, replacements, pattern, counter))
+    cleaned = []
+    for text in texts:
+        if isinstance(text, str):
+            cleaned.append(
+                _replace_text(text, _worker_replacements, _worker_pattern, counter)
+            )
+        else:
+            cleaned.append(text)  # missing values pass through untouched
+    return cleaned, counter
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=os.cpu_count(), initializer=_init_worker,
+            initargs=('fully_expanded_dataset.csv',),
+        )
+    return _executor
+
+def _replace_parallel(texts, counter):
+    workers = min(os.cpu_count() or 1, max(1, len(texts) // 1000))
+    slices = np.array_split(np.asarray(texts, dtype=object), workers)
+    replaced = []
+    for cleaned, local_counter in _get_executor().map(
+        _clean_slice, [s.tolist() for s in slices]
+    ):
+        replaced.extend(cleaned)
+        counter.update(local_counter)
+    return replaced
+
+# Dedupe kicks in once unique notes drop to half the rows or fewer; below
+# that the per-unique Counter bookkeeping costs more than it saves.
+_DEDUP_MAX_UNIQUE_RATIO = 0.5
+
+def _replace_deduped(notes, replacements, pattern, counter, dup_counts):
+    # Clinical exports repeat boilerplate rows heavily; scan each distinct
+    # note once, broadcast the result back with a map, and scale each
+    # note's match counts by its duplicate count.
+    mapping = {}
+    for text, n in dup_counts.items():
+        local = Counter()
+        mapping[text] = _replace_text(text, replacements, pattern, local)
+        if n == 1:
+            counter.update(local)
+        else:
+            for word, cnt in local.items():
+                counter[word] += cnt * n
+    return notes.map(mapping)
+
+def clean_chunk(df, replacements, pattern, counter):
+    notes = df['Clinical Notes'].astype(str)
+    df['Original Notes'] = notes  # kept for the report/PDF writers
+    # The pattern is compiled with re.IGNORECASE (and the Hyperscan
+    # database with HS_FLAG_CASELESS), so no lowered copy of each note is
+    # made and non-replaced text keeps its original casing.
+    dup_counts = notes.value_counts()
+    if len(dup_counts) <= _DEDUP_MAX_UNIQUE_RATIO * len(notes):
+        replaced = _replace_deduped(notes, replacements, pattern, counter, dup_counts)
+    elif len(notes) >= _PARALLEL_MIN_ROWS and (os.cpu_count() or 1) > 1:
+        replaced = pd.Series(
+            _replace_parallel(notes.tolist(), counter), index=df.index
+        )
+    elif (_ext_scanner is None and _hs_db is None and _automaton is not None
+          and hasattr(np, 'strings')):
+        # The automaton path is the only one that still needs lowered scan
+        # copies; make them all at once in C with np.strings.lower instead
+        # of str.lower per row. The batched copies are only offset-safe
+        # for ASCII rows — the fixed-width 'U' array silently truncates
+        # characters that grow when lowered ('İstanbul pt' becomes
+        # 'i̇stanbul p'), which even a length check cannot see. Other rows
+        # lower themselves inside _replace_ac, where the regex-fallback
+        # guard applies; missing values pass through untouched.
+        arr = np.asarray(notes, dtype='U')
+        replaced = pd.Series(
+            [
+                _replace_ac(text, counter, scan if text.isascii() else None)
+                if isinstance(text, str) else text
+                for text, scan in zip(notes.tolist(), np.strings.lower(arr).tolist())
+            ],
+            index=df.index,
+        )
+    else:
+        replaced = notes.map(
+            lambda text: _replace_text(text, replacements, pattern, counter),
+            na_action='ignore',
+        )
+    # An empty chunk or an all-missing column comes back float64 (the NaN
+    # passthrough leaves nothing string-typed), which the .str accessor
+    # below rejects; re-coerce to the notes dtype so those rows still
+    # pass through as-is.
+    if replaced.dtype != notes.dtype:
+        replaced = replaced.astype(notes.dtype)
+    # Symbol stripping and whitespace normalisation run as vectorized
+    # Series.str passes instead of per-row apply_regex calls.
+    df['Cleaned Notes'] = (
+        replaced.str.replace(_SYM, '', regex=True)
+                .str.replace(_WS, ' ', regex=True)
+                .str.strip()
     )
-    return df, counter
\ No newline at end of file
+    return df
+
+def clean_notes(df, replacements, pattern):
+    counter = Counter()
+    return clean_chunk(df, replacements, pattern, counter), counter
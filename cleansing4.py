@@ -2,18 +2,10 @@ import pandas as pd
 import os
 import re
 from collections import Counter
+from cleanser import load_replacements
 
-# === Load replacement dictionary ===
-replacement_df = pd.read_csv('fully_expanded_dataset.csv').dropna()
-replacements = {
-    row['shorthand'].strip().lower(): row['full_form'].strip().lower()
-    for _, row in replacement_df.iterrows()
-}
-
-# Compile regex pattern to do all replacements at once
-replacement_pattern = re.compile(
-    r'\b(' + '|'.join(re.escape(k) for k in replacements.keys()) + r')\b'
-)
+# === Load replacement dictionary (shared cached load from cleanser) ===
+replacements, replacement_pattern = load_replacements('fully_expanded_dataset.csv')
 
 def bulk_replace(text, counter):
     def replace_match(match):
@@ -22,10 +14,12 @@ def bulk_replace(text, counter):
         return replacements[word]
     return replacement_pattern.sub(replace_match, str(text).lower())
 
-# Updated: Keep commas in the text
+# Updated: Keep commas in the text (patterns compiled once at module scope)
+_SYM = re.compile(r'[^\w\s,]')  # keep only word chars, spaces, and commas
+_WS = re.compile(r'\s+')
+
 def apply_regex(text):
-    text = re.sub(r'[^\w\s,]', '', text)  # keep only word chars, spaces, and commas
-    return re.sub(r'\s+', ' ', text).strip()
+    return _WS.sub(' ', _SYM.sub('', text)).strip()
 
 # === Paths ===
 input_folder = 'input'
@@ -4,7 +4,8 @@ import re
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 from collections import Counter
-from fpdf import FPDF
+from cleanser import load_replacements, apply_regex
+from pdf_report import write_pdf_report
 
 # === Setup Paths ===
 input_dir = 'input'
@@ -17,22 +18,12 @@ os.makedirs(output_dir, exist_ok=True)
 os.makedirs(visual_dir, exist_ok=True)
 os.makedirs(log_dir, exist_ok=True)
 
-# === Load Replacement Dictionary ===
-rep_df = pd.read_csv(rep_file).dropna()
-rep_df.columns = [col.strip().lower() for col in rep_df.columns]
-replacements = {
-    row['shorthand'].strip().lower(): row['full_form'].strip().lower()
-    for _, row in rep_df.iterrows()
-}
-replacement_pattern = re.compile(
-    r'\b(' + '|'.join(re.escape(k) for k in replacements.keys()) + r')\b'
-)
+# === Load Replacement Dictionary (shared cached load from cleanser) ===
+replacements, replacement_pattern = load_replacements(rep_file)
 
 # === Cleaning Functions ===
-def apply_regex(text):
-    text = re.sub(r'[^\w\s,\/]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+# apply_regex comes from cleanser, where its two patterns are compiled once
+# at module scope.
 
 def bulk_replace(text, counter):
     def replace_match(match):
@@ -122,20 +113,12 @@ for filename in os.listdir(input_dir):
         for word, count in replacement_counts.items():
             log_file.write(f"{word} -> {replacements[word]} : {count} replacements\n")
 
-    # Save PDF
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", size=11)
-    pdf.cell(200, 10, txt="Clinical Notes Cleaning Report", ln=True, align='C')
-    pdf.ln(10)
-    for i, row in df.iterrows():
-        pdf.multi_cell(0, 8, f"Original: {row['Original Notes']}", align='L')
-        pdf.multi_cell(0, 8, f"Cleaned: {row['Cleaned Notes']}", align='L')
-        pdf.ln(5)
-        if i % 100 == 0 and i != 0:
-            pdf.add_page()
-    pdf.output(os.path.join(output_dir, output_base + '.pdf'))
+    # Save PDF (streamed page by page via reportlab)
+    write_pdf_report(
+        os.path.join(output_dir, output_base + '.pdf'),
+        df['Original Notes'].to_numpy(),
+        df['Cleaned Notes'].to_numpy(),
+    )
 
     # Generate Visualizations
     original_words = pd.Series(re.findall(r'\b\w+\b', ' '.join(df['Original Notes']).lower()))
@@ -0,0 +1,40 @@
+import textwrap
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+_PAGE_WIDTH, _PAGE_HEIGHT = A4
+_MARGIN = 40
+_FONT = ('Helvetica', 11)
+_WRAP_WIDTH = 100
+
+def write_pdf_report(path, originals, cleaneds, title="Clinical Notes Cleaning Report"):
+    """Write the Original/Cleaned report with reportlab, page by page.
+
+    Note: Canvas keeps the compressed page streams in memory and only
+    writes the file on save(), so this is not fully streaming — but each
+    page is compressed as it finishes, which is still far lighter than
+    fpdf's uncompressed in-memory document build.
+    """
+    pdf = canvas.Canvas(path, pagesize=A4)
+    pdf.setFont(*_FONT)
+    pdf.drawCentredString(_PAGE_WIDTH / 2, _PAGE_HEIGHT - _MARGIN, title)
+    text = pdf.beginText(_MARGIN, _PAGE_HEIGHT - _MARGIN - 2 * _FONT[1])
+    text.setFont(*_FONT)
+
+    def emit(line):
+        nonlocal text
+        for part in textwrap.wrap(line, _WRAP_WIDTH) or ['']:
+            if text.getY() < _MARGIN:
+                pdf.drawText(text)
+                pdf.showPage()  # closes the page; the file is written on save()
+                text = pdf.beginText(_MARGIN, _PAGE_HEIGHT - _MARGIN)
+                text.setFont(*_FONT)
+            text.textLine(part)
+
+    for orig, cleaned in zip(originals, cleaneds):
+        emit(f"Original: {orig}")
+        emit(f"Cleaned: {cleaned}")
+        emit("")
+    pdf.drawText(text)
+    pdf.save()